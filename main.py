@@ -1,8 +1,76 @@
+import io
+import math
 import numpy as np
-import pandas as pd
 import random
+from collections import defaultdict
+import weakref
 import streamlit as st
-from matplotlib import pyplot as plt
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+
+# Figures are only ever rasterized to PNG, so pin the non-interactive backend
+matplotlib.use('Agg')
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to NumPy reductions
+    njit = None
+
+def _jit(**options):
+    """
+    Compile with numba.njit(**options) when numba is installed; otherwise leave
+    the function as plain Python.
+    """
+    if njit is None:
+        return lambda func: func
+    return njit(**options)
+
+def _amplitudes(concepts):
+    return np.fromiter((concept.amplitude for concept in concepts), dtype=np.complex128)
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _combined_sums(re, im):
+        """
+        Return (Σre, Σim, Σ|ψ|²) for split real/imaginary amplitude arrays.
+        """
+        sum_re = 0.0
+        sum_im = 0.0
+        prob_sum = 0.0
+        for k in range(re.size):
+            sum_re += re[k]
+            sum_im += im[k]
+            prob_sum += re[k] * re[k] + im[k] * im[k]
+        return sum_re, sum_im, prob_sum
+else:
+    def _combined_sums(re, im):
+        """
+        Return (Σre, Σim, Σ|ψ|²) for split real/imaginary amplitude arrays.
+        """
+        # Plain floats, matching what the numba kernel returns
+        return float(re.sum()), float(im.sum()), float(np.dot(re, re) + np.dot(im, im))
+
+@_jit(cache=True)
+def _combine(re, im):
+    """
+    Shared kernel behind `calculate_combined_probability` and the complex-plane
+    figure: returns the clipped combined probability, the interference term,
+    and the (unnormalized) combined amplitude.
+    """
+    total_re, total_im, individual_prob_sum = _combined_sums(re, im)
+    combined_amp_sq = total_re * total_re + total_im * total_im
+
+    # Σ_{i≠j} Re(ψ_i ψ_j*) is exactly |Σψ|² - Σ|ψ|²
+    interference_term = combined_amp_sq - individual_prob_sum
+
+    if individual_prob_sum > 0:
+        combined_prob = combined_amp_sq / individual_prob_sum
+        combined_prob = 1.0 if combined_prob > 1.0 else (0.0 if combined_prob < 0.0 else combined_prob)
+    else:
+        combined_prob = 0.0
+
+    return combined_prob, interference_term, complex(total_re, total_im)
 
 class Concept:
     def __init__(self, name, probability, phase=0, color='b'):
@@ -12,59 +80,176 @@ class Concept:
             raise ValueError("Probability must be less than or equal to 1")
             
         self.name = name
-        self.amplitude = np.sqrt(probability) * np.exp(1j * phase)
+        magnitude = math.sqrt(probability)
+        self.amplitude = complex(magnitude * math.cos(phase), magnitude * math.sin(phase))
         self.color = color
-        self._probability = probability
+        self._probability = float(probability)
+        self._phase = math.atan2(self.amplitude.imag, self.amplitude.real)
 
     @property
     def probability(self):
         return self._probability
 
+    @property
+    def phase(self):
+        return self._phase
+
+    def _depends_on(self, concept):
+        return self is concept
+
 class CompositeConcept(Concept):
-    def __init__(self, name, concepts, interference_phases=None, color='b'):
+    def __init__(self, name, concepts, interference_phases=None, color='b', manager=None):
         self.name = name
         self.concepts = concepts
         self.interference_phases = interference_phases or [0]*len(concepts)
         self.color = color
-        self.amplitude = self.calculate_combined_amplitude()
-        self._probability = np.abs(self.amplitude) ** 2
+        self._phases = np.asarray(self.interference_phases, dtype=np.float64)
+        self._manager = weakref.ref(manager) if manager is not None else None
+        self._cached_version = None
+        self._amplitude = 0j
+        self._probability = 0.0
+        self._phase = 0.0
+
+    @property
+    def amplitude(self):
+        self._refresh()
+        return self._amplitude
+
+    @property
+    def probability(self):
+        self._refresh()
+        return self._probability
+
+    @property
+    def phase(self):
+        self._refresh()
+        return self._phase
+
+    def _refresh(self):
+        """
+        Recompute the cached amplitude only when the owning manager's version has
+        changed, picking up any child concept re-added under the same name.
+        """
+        manager = self._manager() if self._manager is not None else None
+        version = manager._version if manager is not None else 0
+        if version == self._cached_version:
+            return
+        self._cached_version = version
+
+        if manager is not None:
+            self.concepts = [self._resolve_child(manager, concept) for concept in self.concepts]
+        self._amplitude = complex(self.calculate_combined_amplitude())
+        self._probability = self._amplitude.real * self._amplitude.real + \
+                            self._amplitude.imag * self._amplitude.imag
+        self._phase = math.atan2(self._amplitude.imag, self._amplitude.real)
+
+    def _resolve_child(self, manager, concept):
+        """
+        Return the manager's current concept named like `concept`, unless adopting it
+        would make this composite depend on itself; then keep the original child.
+        """
+        candidate = manager.concepts.get(concept.name, concept)
+        if candidate is concept or candidate._depends_on(self):
+            return concept
+        return candidate
+
+    def _depends_on(self, concept):
+        # Walks child objects rather than names, so it sees the graph actually used;
+        # shared subtrees are visited once
+        stack = [self]
+        visited = set()
+        while stack:
+            node = stack.pop()
+            if node is concept:
+                return True
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            if isinstance(node, CompositeConcept):
+                stack.extend(node.concepts)
+        return False
 
     def calculate_combined_amplitude(self):
-        total_prob = sum(concept.probability for concept in self.concepts)
+        amplitudes = _amplitudes(self.concepts)
+        total_prob = np.vdot(amplitudes, amplitudes).real
         if total_prob == 0:
-            return 0
-        
-        normalization_factor = np.sqrt(1 / total_prob)
+            return 0j
         
-        combined_amplitude = 0
-        for concept, phase_shift in zip(self.concepts, self.interference_phases):
-            normalized_amplitude = concept.amplitude * normalization_factor
-            shifted_amplitude = normalized_amplitude * np.exp(1j * phase_shift)
-            combined_amplitude += shifted_amplitude
-            
-        return combined_amplitude
+        # Σ ψ_k e^{iφ_k} as one unconjugated complex dot product
+        return np.dot(amplitudes, np.exp(1j * self._phases)) / np.sqrt(total_prob)
 
 class ConceptManager:
     def __init__(self):
         self.concepts = {}
         self.relations = []
+        # Amplitudes mirrored into contiguous real/imaginary float64 arrays, in the
+        # same order as `concepts`, so probability math runs as vectorized NumPy calls.
+        # The buffers grow geometrically; only the first len(self._names) rows are live.
+        self._names = []
+        self._re = np.empty(8)
+        self._im = np.empty(8)
+        # Bumped on every add/remove; composites recompute their amplitude when it changes
+        self._version = 0
+        # Reverse index: concept name -> names of composites built directly on it
+        self._dependents = defaultdict(set)
 
     def add_concept(self, concept):
+        replacing = concept.name in self.concepts
+        if replacing:
+            self._forget_dependencies(self.concepts[concept.name])
         self.concepts[concept.name] = concept
+        self._version += 1
+        if replacing:
+            # Composites built on the replaced concept change too, so resync every row
+            for index, name in enumerate(self._names):
+                amplitude = self.concepts[name].amplitude
+                self._re[index] = amplitude.real
+                self._im[index] = amplitude.imag
+        else:
+            size = len(self._names)
+            if size == self._re.size:
+                self._re = self._grow(self._re, size)
+                self._im = self._grow(self._im, size)
+            self._names.append(concept.name)
+            self._re[size] = concept.amplitude.real
+            self._im[size] = concept.amplitude.imag
+
+    @staticmethod
+    def _grow(buffer, size):
+        grown = np.empty(2 * buffer.size)
+        grown[:size] = buffer[:size]
+        return grown
 
     def remove_concept(self, name):
         if name in self.concepts:
-            dependent_concepts = []
-            for concept_name, concept in self.concepts.items():
-                if isinstance(concept, CompositeConcept):
-                    if any(c.name == name for c in concept.concepts):
-                        dependent_concepts.append(concept_name)
-        
-            for concept_name in dependent_concepts:
-                del self.concepts[concept_name]
-                self.relations = [r for r in self.relations if r[1] != concept_name]
-            
-            del self.concepts[name]
+            for dependent_name in self._dependents.pop(name, set()):
+                self.remove_concept(dependent_name)
+
+            # A cycle in the dependency index may have removed `name` already
+            if name not in self.concepts:
+                return
+            self._forget_dependencies(self.concepts.pop(name))
+            self._remove_amplitude(name)
+            self.relations = [r for r in self.relations if r[1] != name]
+            self._version += 1
+
+    def _forget_dependencies(self, concept):
+        if isinstance(concept, CompositeConcept):
+            for child in concept.concepts:
+                dependents = self._dependents.get(child.name)
+                if dependents is not None:
+                    dependents.discard(concept.name)
+
+    def _remove_amplitude(self, name):
+        index = self._names.index(name)
+        size = len(self._names)
+        del self._names[index]
+        self._re[index:size - 1] = self._re[index + 1:size]
+        self._im[index:size - 1] = self._im[index + 1:size]
+
+    def amplitude_arrays(self):
+        size = len(self._names)
+        return self._re[:size], self._im[:size]
 
     def add_relation(self, concept_names, new_name, interference_phases=None, color='b'):
         if not all(name in self.concepts for name in concept_names):
@@ -72,8 +257,10 @@ class ConceptManager:
             raise ValueError(f"Concepts not found: {missing}")
             
         concepts = [self.concepts[name] for name in concept_names]
-        composite_concept = CompositeConcept(new_name, concepts, interference_phases, color=color)
+        composite_concept = CompositeConcept(new_name, concepts, interference_phases, color=color, manager=self)
         self.add_concept(composite_concept)
+        for name in concept_names:
+            self._dependents[name].add(new_name)
         self.relations.append((concept_names, new_name, interference_phases))
         return composite_concept
     
@@ -85,36 +272,52 @@ def calculate_combined_probability(concepts):
     Calculate the combined probability using quantum interference effects.
     Includes proper normalization and interference terms.
     """
-    combined_amplitude = sum(concept.amplitude for concept in concepts)
-    
-    individual_prob_sum = sum(concept.probability for concept in concepts)
-    
-    interference_term = 0
-    for i, c1 in enumerate(concepts):
-        for j, c2 in enumerate(concepts):
-            if i != j:
-                interference_term += np.real(c1.amplitude * np.conj(c2.amplitude))
-    
-    if individual_prob_sum > 0:
-        combined_prob = (np.abs(combined_amplitude) ** 2) / individual_prob_sum
-        combined_prob = np.clip(combined_prob, 0, 1)
-    else:
-        combined_prob = 0
-        
+    amplitudes = _amplitudes(concepts)
+    combined_prob, interference_term, _ = _combine(amplitudes.real, amplitudes.imag)
     return combined_prob, interference_term
 
-def plot_complex_plane(concepts):
+# Unit circle vertices, computed once at import
+_CIRCLE_THETA = np.linspace(0, 2 * np.pi, 128)
+_CIRCLE_X, _CIRCLE_Y = np.cos(_CIRCLE_THETA), np.sin(_CIRCLE_THETA)
+
+def _init_axes(ax, xlim, ylim):
+    """
+    Draw the static background of the complex plane: unit circle, limits, grid,
+    axis lines, and title. Nothing here depends on the concepts being plotted.
+    """
+    ax.plot(_CIRCLE_X, _CIRCLE_Y, color='gray', linestyle='--', linewidth=1.0, alpha=0.5)
+    ax.set_xlim(-xlim, xlim)
+    ax.set_ylim(-ylim, ylim)
+    ax.set_aspect('equal', 'box')
+    ax.grid(True, alpha=0.3)
+    ax.axhline(0, color='black', linewidth=0.5)
+    ax.axvline(0, color='black', linewidth=0.5)
+    ax.set_title("Normalized Probability Amplitudes in Complex Plane")
+
+def plot_complex_plane(manager):
     """
-    Plot quantum concepts on the complex plane with normalized amplitudes, combined state,
-    and individual probabilities for each concept. Labels are positioned to avoid overlap.
+    Render the complex-plane figure for the manager's concepts. The rendered PNG
+    is memoized on the concepts' names, amplitudes, and colors, so reruns that
+    don't change them skip both building and rasterizing the figure.
     """
-    fig, ax = plt.subplots(figsize=(10, 10))
+    names = tuple(manager.concepts)
+    colors = tuple(concept.color for concept in manager.concepts.values())
+    st.image(_figure_png(names, colors, *manager.amplitude_arrays()), output_format='PNG')
 
-    # Draw unit circle
-    circle = plt.Circle((0, 0), 1, fill=False, color='gray', linestyle='--', alpha=0.5)
-    ax.add_artist(circle)
+@st.cache_data(max_entries=32, show_spinner=False)
+def _figure_png(names, colors, re, im):
+    """
+    Plot quantum concepts, given as parallel names/colors/real/imaginary arrays,
+    on the complex plane with normalized amplitudes, combined state, and
+    individual probabilities for each concept. Labels are positioned to avoid
+    overlap. Returns the rendered figure as PNG bytes.
+    """
+    # A bare Figure stays out of pyplot's global figure registry, so there is nothing to close
+    fig = Figure(figsize=(10, 10))
+    ax = fig.subplots()
 
     xlim, ylim = 1.2, 1.2
+    _init_axes(ax, xlim, ylim)
 
     def calculate_label_position(amplitude, fixed_distance=0.3):
         """
@@ -124,10 +327,10 @@ def plot_complex_plane(concepts):
         if amplitude == 0:
             return fixed_distance, fixed_distance
         
-        angle = np.angle(amplitude)
+        angle = math.atan2(amplitude.imag, amplitude.real)
         
-        label_x = fixed_distance * np.cos(angle)
-        label_y = fixed_distance * np.sin(angle)
+        label_x = fixed_distance * math.cos(angle)
+        label_y = fixed_distance * math.sin(angle)
         
         min_spacing = 0.05
         if abs(label_x) < min_spacing:
@@ -138,54 +341,59 @@ def plot_complex_plane(concepts):
         label_x += amplitude.real
         label_y += amplitude.imag
         
-        label_x = np.clip(label_x, -xlim + 0.2, xlim - 0.2)
-        label_y = np.clip(label_y, -ylim + 0.2, ylim - 0.2)
+        label_x = min(max(label_x, -xlim + 0.2), xlim - 0.2)
+        label_y = min(max(label_y, -ylim + 0.2), ylim - 0.2)
         
         return label_x, label_y
 
-    individual_probs = calculate_individual_probabilities(concepts)
-    combined_prob, interference_term = calculate_combined_probability(concepts)
+    individual_probs = (re * re + im * im).tolist()
+    combined_prob, interference_term, combined_amplitude = _combine(re, im)
     
-    total_prob = sum(concept.probability for concept in concepts)
+    total_prob = sum(individual_probs)
     normalization_factor = np.sqrt(1 / total_prob) if total_prob > 0 else 1
     
-    for concept in concepts:
-        normalized_amplitude = concept.amplitude * normalization_factor
-        
-        ax.quiver(0, 0, normalized_amplitude.real, normalized_amplitude.imag,
-                  color=concept.color, angles='xy', scale_units='xy', scale=1,
-                  label=f"{concept.name} (P={individual_probs[concept.name]:.2f})", 
-                  width=0.008)
-        
+    normalized_amplitudes = (re + 1j * im) * normalization_factor
+    combined_amplitude = combined_amplitude * normalization_factor
+    vectors = np.append(normalized_amplitudes, combined_amplitude)
+    origins = np.zeros(len(vectors))
+
+    # One Quiver collection for every concept plus the combined state; legend entries come from proxy patches
+    ax.quiver(origins, origins, vectors.real, vectors.imag,
+              color=list(colors) + ['red'], angles='xy', scale_units='xy', scale=1,
+              width=0.008)
+    legend_handles = [Patch(color=color, label=f"{name} (P={probability:.2f})")
+                      for name, color, probability in zip(names, colors, individual_probs)]
+    legend_handles.append(Patch(color='red', label=f"Combined (P={combined_prob:.2f})"))
+
+    # Python floats format faster than NumPy scalars in the label f-strings
+    magnitudes = np.abs(normalized_amplitudes).tolist()
+    phases = np.angle(normalized_amplitudes).tolist()
+
+    for name, color, probability, normalized_amplitude, magnitude, phase in zip(
+            names, colors, individual_probs, normalized_amplitudes, magnitudes, phases):
         label_x, label_y = calculate_label_position(normalized_amplitude)
         
         ax.plot([normalized_amplitude.real, label_x], 
                 [normalized_amplitude.imag, label_y],
-                color=concept.color, linestyle=':', alpha=0.5)
+                color=color, linestyle=':', alpha=0.5)
         
-        label_text = f"{concept.name}\n|ψ|={np.abs(normalized_amplitude):.2f}\n"\
-                     f"φ={np.angle(normalized_amplitude):.2f}\n"\
-                     f"P={individual_probs[concept.name]:.2f}"
+        label_text = f"{name}\n|ψ|={magnitude:.2f}\n"\
+                     f"φ={phase:.2f}\n"\
+                     f"P={probability:.2f}"
         
-        bbox_props = dict(boxstyle="round,pad=0.5", fc="white", ec=concept.color, alpha=0.8)
+        bbox_props = dict(boxstyle="round,pad=0.5", fc="white", ec=color, alpha=0.8)
         ax.text(label_x, label_y, label_text,
-                color=concept.color, fontsize=9, ha='center', va='center',
+                color=color, fontsize=9, ha='center', va='center',
                 bbox=bbox_props)
 
-    combined_amplitude = sum(concept.amplitude * normalization_factor for concept in concepts)
-    
-    ax.quiver(0, 0, combined_amplitude.real, combined_amplitude.imag,
-              color='red', angles='xy', scale_units='xy', scale=1,
-              label=f"Combined (P={combined_prob:.2f})", width=0.008)
-
     label_x, label_y = calculate_label_position(combined_amplitude)
     
     ax.plot([combined_amplitude.real, label_x],
             [combined_amplitude.imag, label_y],
             color='red', linestyle=':', alpha=0.5)
     
-    combined_text = f"Combined\n|ψ|={np.abs(combined_amplitude):.2f}\n"\
-                    f"φ={np.angle(combined_amplitude):.2f}\n"\
+    combined_text = f"Combined\n|ψ|={math.hypot(combined_amplitude.real, combined_amplitude.imag):.2f}\n"\
+                    f"φ={math.atan2(combined_amplitude.imag, combined_amplitude.real):.2f}\n"\
                     f"P={combined_prob:.2f}\n"\
                     f"Int={interference_term:.2f}"
     
@@ -194,19 +402,43 @@ def plot_complex_plane(concepts):
             color='red', fontsize=9, ha='center', va='center',
             bbox=bbox_props)
 
-    ax.set_xlim(-xlim, xlim)
-    ax.set_ylim(-ylim, ylim)
-    ax.set_aspect('equal', 'box')
-    ax.grid(True, alpha=0.3)
-    ax.axhline(0, color='black', linewidth=0.5)
-    ax.axvline(0, color='black', linewidth=0.5)
-    ax.set_title("Normalized Probability Amplitudes in Complex Plane")
-    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.legend(handles=legend_handles, bbox_to_anchor=(1.05, 1), loc='upper left')
 
-    st.pyplot(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    return buffer.getvalue()
 
 def random_color():
-    return "#{:02x}{:02x}{:02x}".format(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+    return f"#{random.getrandbits(24):06x}"
+
+@st.fragment
+def concept_sidebar(manager):
+    """
+    Render the current concepts and the removal form. Runs as a fragment, so
+    submitting the form reruns only the sidebar; removing a concept triggers a
+    full app rerun.
+    """
+    st.header("Current Concepts")
+    if manager.concepts:
+        concepts_list = list(manager.concepts.keys())
+        for name in concepts_list:
+            concept = manager.concepts[name]
+            st.markdown(f"**{name}**")
+            st.markdown(f"- Probability: {concept.probability:.2f}")
+            st.markdown(f"- Phase: {concept.phase:.2f} rad")
+            st.markdown(
+                f"<div style='width:20px;height:20px;background-color:{concept.color};border:1px solid #000;'></div>",
+                unsafe_allow_html=True)
+            st.markdown("---")
+        with st.form("remove_concept_form"):
+            remove_name = st.selectbox("Select Concept to Remove", [""] + concepts_list, key="remove_concept")
+            submitted = st.form_submit_button("Remove Concept")
+            if submitted and remove_name:
+                manager.remove_concept(remove_name)
+                st.success(f"Concept '{remove_name}' removed.")
+                st.rerun()
+    else:
+        st.write("No concepts available.")
 
 def main():
     st.set_page_config(page_title="Quantum Concept Manager", layout="wide")
@@ -219,8 +451,6 @@ def main():
         st.session_state.interference_term = None
     if 'show_visualization' not in st.session_state:
         st.session_state.show_visualization = False
-    if 'probabilities_dataframe' not in st.session_state:
-        st.session_state.probabilities_dataframe = pd.DataFrame()
 
     tabs = st.tabs(["Add Concept", "Create Composite Concept", "Visualization"])
 
@@ -288,32 +518,13 @@ def main():
                 st.session_state.show_visualization = True
             if st.session_state.show_visualization:
                 if st.session_state.manager.concepts:
-                    plot_complex_plane(st.session_state.manager.concepts.values())
+                    plot_complex_plane(st.session_state.manager)
                 else:
                     st.warning("No concepts available to visualize.")
 
     # Sidebar for Current Concepts
     with st.sidebar:
-        st.header("Current Concepts")
-        if st.session_state.manager.concepts:
-            concepts_list = list(st.session_state.manager.concepts.keys())
-            for name in concepts_list:
-                concept = st.session_state.manager.concepts[name]
-                st.markdown(f"**{name}**")
-                st.markdown(f"- Probability: {concept.probability:.2f}")
-                st.markdown(f"- Phase: {np.angle(concept.amplitude):.2f} rad")
-                st.markdown(
-                    f"<div style='width:20px;height:20px;background-color:{concept.color};border:1px solid #000;'></div>",
-                    unsafe_allow_html=True)
-                st.markdown("---")
-            remove_name = st.selectbox("Select Concept to Remove", [""] + concepts_list, key="remove_concept")
-            if st.button("Remove Concept", key="remove_button"):
-                if remove_name:
-                    st.session_state.manager.remove_concept(remove_name)
-                    st.success(f"Concept '{remove_name}' removed.")
-                    st.rerun()
-        else:
-            st.write("No concepts available.")
+        concept_sidebar(st.session_state.manager)
 
 if __name__ == "__main__":
     main()
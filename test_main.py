@@ -0,0 +1,113 @@
+import cmath
+import math
+
+import numpy as np
+
+from main import CompositeConcept, Concept, ConceptManager, calculate_combined_probability
+
+
+def make_manager(*names):
+    manager = ConceptManager()
+    for name in names:
+        manager.add_concept(Concept(name, 0.4, 0.5))
+    return manager
+
+
+def test_composite_named_after_its_own_child():
+    manager = make_manager('A', 'B')
+    manager.add_relation(['A', 'B'], 'AB')
+    old_a = manager.concepts['A']
+
+    new_a = manager.add_relation(['A'], 'A')
+
+    assert new_a.concepts == [old_a]
+    assert manager.concepts['AB'].concepts[0] is new_a
+    for concept in manager.concepts.values():
+        assert math.isfinite(concept.probability)
+        assert math.isfinite(concept.phase)
+
+
+def test_composites_built_from_each_other():
+    manager = make_manager('A')
+    old_a = manager.concepts['A']
+    c = manager.add_relation(['A'], 'C')
+
+    new_a = manager.add_relation(['C'], 'A')
+
+    assert new_a.concepts == [c]
+    assert c.concepts == [old_a]
+    for concept in manager.concepts.values():
+        assert math.isfinite(concept.probability)
+
+
+def test_remove_concept_with_cyclic_dependents():
+    manager = make_manager('A', 'B')
+    manager.add_relation(['A'], 'C')
+    manager.add_relation(['C'], 'A')
+    manager.add_relation(['A'], 'A')
+
+    manager.remove_concept('A')
+
+    assert list(manager.concepts) == ['B']
+    assert manager._names == ['B']
+    assert manager.relations == []
+
+
+def test_calculate_combined_amplitude_on_new_composite():
+    a, b = Concept('A', 0.3, 0.5), Concept('B', 0.6, 2.0)
+    composite = CompositeConcept('AB', [a, b], [0.1, 0.4])
+
+    expected = (a.amplitude * cmath.exp(0.1j) + b.amplitude * cmath.exp(0.4j)) / math.sqrt(0.9)
+    assert cmath.isclose(composite.calculate_combined_amplitude(), expected)
+    assert cmath.isclose(composite.amplitude, expected)
+
+
+def test_recreating_a_leaf_under_deep_shared_composites():
+    # Each composite reuses the two before it; an unmemoized dependency walk is exponential here
+    manager = ConceptManager()
+    for prefix in 'cd':
+        manager.add_concept(Concept(f'{prefix}0', 0.5, 0.1))
+        manager.add_concept(Concept(f'{prefix}1', 0.5, 0.7))
+        for i in range(2, 60):
+            manager.add_relation([f'{prefix}{i - 2}', f'{prefix}{i - 1}'], f'{prefix}{i}')
+
+    new_c0 = manager.add_relation(['d59'], 'c0')
+
+    assert manager.concepts['c2'].concepts[0] is new_c0
+    for concept in manager.concepts.values():
+        assert math.isfinite(concept.probability)
+
+
+def test_remove_leaf_removes_composites_built_on_it():
+    manager = make_manager('A', 'B', 'C', 'D')
+    manager.add_relation(['A', 'B'], 'AB')
+    manager.add_relation(['AB', 'C'], 'X')
+    manager.add_relation(['C', 'D'], 'CD')
+
+    manager.remove_concept('A')
+
+    assert list(manager.concepts) == ['B', 'C', 'D', 'CD']
+    assert [relation[1] for relation in manager.relations] == ['CD']
+    assert manager._names == ['B', 'C', 'D', 'CD']
+
+
+def test_amplitude_buffers_grow_and_compact():
+    manager = ConceptManager()
+    for i in range(20):
+        manager.add_concept(Concept(f'c{i}', (i % 10) / 10, 0.3 * i))
+    for name in ('c3', 'c10', 'c11', 'c17'):
+        manager.remove_concept(name)
+    manager.add_concept(Concept('c20', 0.25, 1.0))
+
+    re, im = manager.amplitude_arrays()
+    np.testing.assert_allclose(re + 1j * im, [c.amplitude for c in manager.concepts.values()])
+    assert manager._names == list(manager.concepts)
+
+
+def test_combined_probability_returns_plain_floats():
+    concepts = [Concept('A', 0.3, 0.5), Concept('B', 0.6, 2.0)]
+
+    combined_prob, interference_term = calculate_combined_probability(concepts)
+
+    assert type(combined_prob) is float
+    assert type(interference_term) is float